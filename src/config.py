@@ -14,6 +14,7 @@ class Settings(BaseSettings):
     dagshub_user_token: str
     tf_use_legacy_keras: int = 1
     database_url: str
+    cache_dir: str = "~/.cache/mbajk"
 
     __project_root = pathlib.Path(__file__).resolve().parent.parent
 
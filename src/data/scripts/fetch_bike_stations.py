@@ -2,6 +2,7 @@ from src.config import settings
 from src.data.data_fetcher import DataFetcher
 from src.data.data_manager import DataManager
 from src.utils.decorators import execution_timer
+from src.utils.logger import setup_logging
 
 
 @execution_timer(name="Fetch Bike Stations")
@@ -15,4 +16,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
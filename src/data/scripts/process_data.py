@@ -8,6 +8,7 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MinMaxScaler
 from src.data.data_manager import DataManager
 from src.utils.decorators import execution_timer
+from src.utils.logger import setup_logging
 
 
 def get_station_data(df: pd.DataFrame, station_number: int) -> pd.DataFrame:
@@ -104,4 +105,5 @@ def main() -> None:
 
 
 if __name__ == '__main__':
+    setup_logging()
     main()
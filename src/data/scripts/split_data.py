@@ -2,6 +2,7 @@ import os
 
 from src.data.data_manager import DataManager
 from src.utils.decorators import execution_timer
+from src.utils.logger import setup_logging
 
 
 @execution_timer("Split Data")
@@ -30,4 +31,5 @@ def main():
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -1,4 +1,35 @@
 import os
+import dagshub
+import dagshub.auth
+import mlflow
+import onnxruntime as ort
+from src.config import settings
+
+
+def init_mlflow_tracking() -> None:
+    dagshub.auth.add_app_token(token=settings.dagshub_user_token)
+    dagshub.init("mbajk-ml-web-service", "perkzen", mlflow=True)
+    mlflow.set_tracking_uri(settings.mlflow_tracking_uri)
+
+
+def get_worker_counts(n_tasks: int) -> tuple[int, int]:
+    # splits the cores between the worker processes, so workers don't each start a thread per core
+    cpu_count = os.cpu_count() or 1
+    max_workers = max(1, min(n_tasks, cpu_count))
+    return max_workers, max(1, cpu_count // max_workers)
+
+
+def create_inference_session(model_path: str, intra_op_num_threads: int = 0) -> ort.InferenceSession:
+    sess_options = ort.SessionOptions()
+    sess_options.intra_op_num_threads = intra_op_num_threads
+
+    return ort.InferenceSession(model_path, sess_options=sess_options, providers=["CPUExecutionProvider"])
+
+
+def get_station_numbers(dir_path: str) -> list[int]:
+    # scandir reuses the file type from the directory listing instead of a stat call per entry
+    with os.scandir(dir_path) as entries:
+        return [int(entry.name) for entry in entries if entry.is_dir()]
 
 
 def write_metrics_to_file(file_path: str, model_name: str, mse: float, mae: float, evs: float) -> None:
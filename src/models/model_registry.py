@@ -1,63 +1,131 @@
+import logging
 import os
-import dagshub.auth
+import shutil
+import tempfile
 import joblib
 import onnx
 from enum import Enum, auto
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable
+from mlflow.artifacts import download_artifacts
+from mlflow.entities.model_registry import ModelVersion
 from mlflow.onnx import load_model as load_onnx
 from mlflow.sklearn import load_model as load_scaler
-from dagshub.data_engine.datasources import mlflow
 from mlflow import MlflowClient
 from sklearn.preprocessing import MinMaxScaler
 from src.config import settings
+from src.models.helpers import init_mlflow_tracking
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_mlflow_client() -> MlflowClient:
+    # a single client keeps its HTTP session (and connections) alive between registry calls
+    return MlflowClient()
+
+
+# latest model version per (name, stage), set with use_latest_versions() to skip per-station registry lookups
+_latest_versions: dict[tuple[str, str], ModelVersion] | None = None
+
+
+def search_latest_versions() -> dict[tuple[str, str], ModelVersion]:
+    client = get_mlflow_client()
+
+    model_versions = []
+    page_token = None
+    while True:
+        page = client.search_model_versions("name LIKE 'mbajk_station_%'", page_token=page_token)
+        model_versions.extend(page)
+        page_token = page.token
+        if not page_token:
+            break
+
+    # later versions overwrite earlier ones, so only the latest version per stage is kept
+    return {(mv.name, mv.current_stage.lower()): mv for mv in sorted(model_versions, key=lambda mv: int(mv.version))}
+
+
+def use_latest_versions(latest_versions: dict[tuple[str, str], ModelVersion] | None) -> None:
+    global _latest_versions
+    _latest_versions = latest_versions
+
+
+def get_latest_versions(name: str, stage: str) -> list[ModelVersion]:
+    if _latest_versions is None:
+        return get_mlflow_client().get_latest_versions(name, stages=[stage])
+
+    model_version = _latest_versions.get((name, stage))
+    return [model_version] if model_version is not None else []
+
+
+def download_model_version(model_version: ModelVersion) -> Path:
+    # artifacts are downloaded once per registered version and loaded from disk afterwards
+    cache_dir = Path(settings.cache_dir).expanduser() / model_version.name / model_version.version
+
+    if cache_dir.exists():
+        return cache_dir
+
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+
+    # pool workers may download the same version at once, so each downloads into its own directory that is
+    # moved into place only once complete, and an interrupted download is never loaded
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir.parent)
+    try:
+        download_artifacts(artifact_uri=model_version.source, dst_path=tmp_dir)
+        os.replace(tmp_dir, cache_dir)
+    except OSError:
+        # another worker finished downloading the same version first
+        if not cache_dir.exists():
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return cache_dir
+
+
+def load_model_version(model_version: ModelVersion, load_fn: Callable[[str], Any]) -> Any:
+    model_path = next(download_model_version(model_version).iterdir())
+    return load_fn(str(model_path))
 
 
 def get_latest_model_version(station_number: int):
     try:
-        client = MlflowClient()
-        model_version = client.get_latest_versions("mbajk_station_" + str(station_number), stages=["staging"])[0]
-        model_url = model_version.source
-        model = load_onnx(model_url)
+        model_version = get_latest_versions("mbajk_station_" + str(station_number), "staging")[0]
+        model = load_model_version(model_version, load_onnx)
         return model
     except IndexError:
-        print(f"Model for station {station_number} not found.")
+        logger.warning(f"Model for station {station_number} not found.")
         return None
 
 
 def get_latest_scaler_version(station_number: int):
     try:
-        client = MlflowClient()
-        model_version = \
-            client.get_latest_versions("mbajk_station_" + str(station_number) + "_scaler", stages=["staging"])[0]
-        model_url = model_version.source
-        scaler = load_scaler(model_url)
+        model_version = get_latest_versions("mbajk_station_" + str(station_number) + "_scaler", "staging")[0]
+        scaler = load_model_version(model_version, load_scaler)
         return scaler
     except IndexError:
-        print(f"Scaler for station {station_number} not found.")
+        logger.warning(f"Scaler for station {station_number} not found.")
         return None
 
 
 def get_production_model(station_number: int):
     try:
-        client = MlflowClient()
-        model_version = client.get_latest_versions("mbajk_station_" + str(station_number), stages=["production"])[0]
-        model_url = model_version.source
-        production_model = load_onnx(model_url)
+        model_version = get_latest_versions("mbajk_station_" + str(station_number), "production")[0]
+        production_model = load_model_version(model_version, load_onnx)
         return production_model
     except IndexError:
-        print(f"Production model for station {station_number} not found.")
+        logger.warning(f"Production model for station {station_number} not found.")
         return None
 
 
 def get_production_scaler(station_number: int):
     try:
-        client = MlflowClient()
-        model_version = \
-            client.get_latest_versions("mbajk_station_" + str(station_number) + "_scaler", stages=["production"])[0]
-        model_url = model_version.source
-        production_scaler = load_scaler(model_url)
+        model_version = get_latest_versions("mbajk_station_" + str(station_number) + "_scaler", "production")[0]
+        production_scaler = load_model_version(model_version, load_scaler)
         return production_scaler
     except IndexError:
-        print(f"Production scaler for station {station_number} not found.")
+        logger.warning(f"Production scaler for station {station_number} not found.")
         return None
 
 
@@ -67,10 +135,6 @@ class ModelType(Enum):
 
 
 def download_model(number: int, model_type: ModelType) -> tuple[str | None, MinMaxScaler | None]:
-    dagshub.auth.add_app_token(token=settings.dagshub_user_token)
-    dagshub.init("mbajk-ml-web-service", "perkzen", mlflow=True)
-    mlflow.set_tracking_uri(settings.mlflow_tracking_uri)
-
     folder_name = f"models/{number}"
     model_type_str = model_type.name.lower()
 
@@ -88,43 +152,47 @@ def download_model(number: int, model_type: ModelType) -> tuple[str | None, MinM
 
     joblib.dump(scaler, f"{folder_name}/minmax_scaler_{model_type_str}.gz")
     onnx.save_model(model, f"{folder_name}/model_{model_type_str}.onnx")
-    print(f"{model_type_str.capitalize()} model for station {number} has been downloaded.")
+    logger.info(f"{model_type_str.capitalize()} model for station {number} has been downloaded.")
 
     # Return model path and scaler
     model_path = f"models/{number}/model_{model_type_str}.onnx"
     return model_path, scaler
 
 
-def download_model_registry():
-    dagshub.auth.add_app_token(token=settings.dagshub_user_token)
-    dagshub.init("mbajk-ml-web-service", "perkzen", mlflow=True)
-    mlflow.set_tracking_uri(settings.mlflow_tracking_uri)
+def download_production_model(number: int) -> bool:
+    model_path = f"models/{number}/model_production.onnx"
+    scaler_path = f"models/{number}/minmax_scaler_production.gz"
 
-    for i in range(1, 30):
-        model_path = f"models/{i}/model_production.onnx"
-        scaler_path = f"models/{i}/minmax_scaler_production.gz"
+    if os.path.exists(model_path) and os.path.exists(scaler_path):
+        logger.info(f"Model for station {number} already exists.")
+        return True
+
+    model = get_production_model(number)
+    scaler = get_production_scaler(number)
+
+    if model is None or scaler is None:
+        return False
+
+    if not os.path.exists(f"models/{number}"):
+        os.makedirs(f"models/{number}")
 
-        if os.path.exists(model_path) and os.path.exists(scaler_path):
-            print(f"Model for station {i} already exists.")
-            continue
+    joblib.dump(scaler, scaler_path)
+    onnx.save_model(model, model_path)
+    logger.info(f"Model for station {number} has been downloaded.")
+    return True
 
-        model = get_production_model(i)
-        scaler = get_production_scaler(i)
 
-        if not os.path.exists(f"models/{i}"):
-            os.makedirs(f"models/{i}")
+def download_model_registry():
+    init_mlflow_tracking()
 
-        joblib.dump(scaler, f"models/{i}/minmax_scaler_production.gz")
-        onnx.save_model(model, f"models/{i}/model_production.onnx")
-        print(f"Model for station {i} has been downloaded.")
+    for i in range(1, 30):
+        download_production_model(i)
 
 
 def empty_model_registry():
-    dagshub.auth.add_app_token(token=settings.dagshub_user_token)
-    dagshub.init("mbajk-ml-web-service", "perkzen", mlflow=True)
-    mlflow.set_tracking_uri(settings.mlflow_tracking_uri)
+    init_mlflow_tracking()
 
-    client = MlflowClient()
+    client = get_mlflow_client()
     for i in range(1, 30):
         client.delete_registered_model(f"mbajk_station_{i}")
         client.delete_registered_model(f"mbajk_station_{i}_scaler")
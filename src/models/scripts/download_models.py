@@ -1,4 +1,5 @@
 from src.models.model_registry import download_model_registry
+from src.utils.logger import setup_logging
 
 
 def main():
@@ -6,4 +7,5 @@ def main():
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -1,88 +1,118 @@
-import os
-import dagshub.auth
-import onnxruntime as ort
+import logging
+import multiprocessing as mp
+from functools import partial
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dagshub.data_engine.datasources import mlflow
-from mlflow import MlflowClient
-from src.config import settings
+from mlflow.entities import Metric
+from mlflow.entities.model_registry import ModelVersion
 from src.models import get_test_train_data
-from src.models.helpers import write_metrics_to_file
+from src.models.helpers import write_metrics_to_file, init_mlflow_tracking, get_station_numbers, \
+    create_inference_session, get_worker_counts
 from src.models.model import prepare_model_data, evaluate_model_performance
-from src.models.model_registry import download_model, ModelType
+from src.models.model_registry import download_model, ModelType, get_mlflow_client, get_latest_versions, \
+    search_latest_versions, use_latest_versions
 from src.utils.decorators import execution_timer
+from src.utils.logger import configure_worker_logging, queue_logging, setup_logging
+
+logger = logging.getLogger(__name__)
 
 
 def update_production_model(station_number: int) -> None:
-    client = MlflowClient()
+    client = get_mlflow_client()
 
-    new_model_version = client.get_latest_versions("mbajk_station_" + str(station_number), stages=["staging"])[
-        0].version
-    new_scaler_version = \
-        client.get_latest_versions("mbajk_station_" + str(station_number) + "_scaler", stages=["staging"])[0].version
+    model_name = "mbajk_station_" + str(station_number)
+    scaler_name = model_name + "_scaler"
 
-    client.transition_model_version_stage("mbajk_station_" + str(station_number), new_model_version, "production")
-    client.transition_model_version_stage("mbajk_station_" + str(station_number) + "_scaler", new_scaler_version,
-                                          "production")
-    print(f"[Update Model] - New model for station {station_number} has been set to production")
+    new_model_version = get_latest_versions(model_name, "staging")[0].version
+    new_scaler_version = get_latest_versions(scaler_name, "staging")[0].version
 
+    # model and scaler are separate registered models, so their transitions can run concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(client.transition_model_version_stage, model_name, new_model_version, "production"),
+            executor.submit(client.transition_model_version_stage, scaler_name, new_scaler_version, "production")
+        ]
+        for future in futures:
+            future.result()
 
-def predict_model_pipeline(station_number: int) -> None:
-    mlflow.start_run(run_name=f"mbajk_station_{station_number}", experiment_id="1", nested=True)
+    logger.info(f"[Update Model] - New model for station {station_number} has been set to production")
 
-    production_model_path, production_scaler = download_model(station_number, ModelType.PRODUCTION)
-    latest_model_path, scaler = download_model(station_number, ModelType.LATEST)
 
-    if latest_model_path is None and scaler is None:
-        # we don't have a staging model because previous staging model was set to production
-        # this could happen when running locally
-        return
+def predict_model_pipeline(station_number: int, intra_op_num_threads: int = 0) -> None:
+    logger.info(f"[Predict Model] - Predicting model for station {station_number}")
 
-    if production_model_path is None and production_scaler is None:
-        update_production_model(station_number)
-        return
+    with mlflow.start_run(run_name=f"mbajk_station_{station_number}", experiment_id="1", nested=True) as run:
+        production_model_path, production_scaler = download_model(station_number, ModelType.PRODUCTION)
+        latest_model_path, scaler = download_model(station_number, ModelType.LATEST)
+
+        if latest_model_path is None and scaler is None:
+            # we don't have a staging model because previous staging model was set to production
+            # this could happen when running locally
+            return
 
-    latest_model = ort.InferenceSession(latest_model_path)
-    production_model = ort.InferenceSession(production_model_path)
+        if production_model_path is None and production_scaler is None:
+            update_production_model(station_number)
+            return
 
-    train_data, test_data = get_test_train_data(str(station_number))
+        latest_model = create_inference_session(latest_model_path, intra_op_num_threads)
+        production_model = create_inference_session(production_model_path, intra_op_num_threads)
 
-    _, _, X_test, y_test = prepare_model_data(scaler=scaler, train_data=train_data,
-                                              test_data=test_data)
+        train_data, test_data = get_test_train_data(str(station_number))
 
-    latest_model_predictions = latest_model.run(["output"], {"input": X_test})[0]
-    mse_test, mae_test, evs_test = evaluate_model_performance(y_test, latest_model_predictions, test_data, scaler)
+        _, _, X_test, y_test = prepare_model_data(scaler=scaler, train_data=train_data,
+                                                  test_data=test_data)
 
-    mlflow.log_metric("MSE_test", mse_test)
-    mlflow.log_metric("MAE_test", mae_test)
-    mlflow.log_metric("EVS_test", evs_test)
+        latest_model_predictions = latest_model.run(["output"], {"input": X_test})[0]
+        mse_test, mae_test, evs_test = evaluate_model_performance(y_test, latest_model_predictions, test_data, scaler)
 
-    production_model_predictions = production_model.run(["output"], {"input": X_test})[0]
-    mse_production, mae_production, evs_production = evaluate_model_performance(y_test,
-                                                                                production_model_predictions,
-                                                                                test_data, production_scaler)
-    # set model to production if it performs better
-    if mse_test < mse_production:
-        update_production_model(station_number)
+        timestamp = int(time.time() * 1000)
+        get_mlflow_client().log_batch(run.info.run_id, metrics=[
+            Metric("MSE_test", mse_test, timestamp, 0),
+            Metric("MAE_test", mae_test, timestamp, 0),
+            Metric("EVS_test", evs_test, timestamp, 0),
+        ])
 
-    write_metrics_to_file(f"reports/{station_number}/metrics.txt", "GRU", mse_test, mae_test, evs_test)
+        production_model_predictions = production_model.run(["output"], {"input": X_test})[0]
+        mse_production, mae_production, evs_production = evaluate_model_performance(y_test,
+                                                                                    production_model_predictions,
+                                                                                    test_data, production_scaler)
+        # set model to production if it performs better
+        if mse_test < mse_production:
+            update_production_model(station_number)
 
-    print(f"[Predict Model] - Train metrics for station {station_number} have been calculated")
+        write_metrics_to_file(f"reports/{station_number}/metrics.txt", "GRU", mse_test, mae_test, evs_test)
 
-    mlflow.end_run()
+        logger.info(f"[Predict Model] - Train metrics for station {station_number} have been calculated")
+
+
+def init_worker(log_queue: mp.Queue, latest_versions: dict[tuple[str, str], ModelVersion]) -> None:
+    configure_worker_logging(log_queue)
+    init_mlflow_tracking()
+    use_latest_versions(latest_versions)
 
 
 @execution_timer("Predict Model")
 def main() -> None:
-    dir_path = "data/processed"
-    station_numbers = [int(folder) for folder in os.listdir(dir_path) if os.path.isdir(os.path.join(dir_path, folder))]
+    station_numbers = get_station_numbers("data/processed")
+    if not station_numbers:
+        return
+
+    # one registry search up front replaces four get_latest_versions calls per station
+    init_mlflow_tracking()
+    latest_versions = search_latest_versions()
 
-    dagshub.auth.add_app_token(token=settings.dagshub_user_token)
-    dagshub.init("mbajk-ml-web-service", "perkzen", mlflow=True)
-    mlflow.set_tracking_uri(settings.mlflow_tracking_uri)
+    mp_context = mp.get_context("spawn")
+    log_queue = mp_context.Queue()
 
-    for station_number in station_numbers:
-        print(f"[Predict Model] - Predicting model for station {station_number}")
-        predict_model_pipeline(station_number)
+    max_workers, threads_per_worker = get_worker_counts(len(station_numbers))
+    pipeline = partial(predict_model_pipeline, intra_op_num_threads=threads_per_worker)
+    with queue_logging(log_queue), ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                                                       initializer=init_worker,
+                                                       initargs=(log_queue, latest_versions)) as executor:
+        list(executor.map(pipeline, station_numbers))
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -1,91 +1,129 @@
+import logging
 import os
-import dagshub.auth
-import dagshub
+import tempfile
+import multiprocessing as mp
 import mlflow
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable
+import onnx
 import tf2onnx
 from mlflow import MlflowClient
+from mlflow.entities import Param
 from sklearn.preprocessing import MinMaxScaler
 from src.config import settings
 from src.utils.decorators import execution_timer
+from src.utils.logger import configure_worker_logging, queue_logging, setup_logging
 from src.models import get_test_train_data
+from src.models.helpers import init_mlflow_tracking, get_station_numbers, get_worker_counts
+from src.models.model_registry import get_mlflow_client
 from src.models.model import train_model, build_model, prepare_model_data
-from mlflow.sklearn import log_model as log_sklearn_model
-from mlflow.onnx import log_model as log_onnx_model
-from mlflow.models import infer_signature
+from mlflow.sklearn import save_model as save_sklearn_model
+from mlflow.onnx import save_model as save_onnx_model
+from mlflow.models import infer_signature, ModelSignature
 import tensorflow as tf
 
+logger = logging.getLogger(__name__)
 
-def train_model_pipeline(station_number: int) -> None:
-    client = MlflowClient()
 
-    mlflow.start_run(run_name=f"mbajk_station_{station_number}", experiment_id="1")
+def upload_model_artifacts(client: MlflowClient, run_id: str, artifact_path: str,
+                           save_fn: Callable[[str], None]) -> str:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        local_path = os.path.join(tmp_dir, "model")
+        save_fn(local_path)
+        client.log_artifacts(run_id, local_path, artifact_path)
 
-    scaler = MinMaxScaler()
+    return f"runs:/{run_id}/{artifact_path}"
 
-    train_data, test_data = get_test_train_data(str(station_number))
 
-    X_train, y_train, X_test, y_test = prepare_model_data(scaler=scaler, train_data=train_data,
-                                                          test_data=test_data)
+def save_artifacts_parallel(client: MlflowClient, run_id: str, station_number: int, onnx_model: onnx.ModelProto,
+                            scaler: MinMaxScaler, signature: ModelSignature) -> None:
+    model_name = "mbajk_station_" + str(station_number)
+    scaler_name = model_name + "_scaler"
+    scaler_meta = {"feature_range": scaler.feature_range}
 
-    epochs = 10
-    batch_size = 64
+    # model and scaler uploads are independent, so they run on separate connections
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        model_future = executor.submit(
+            upload_model_artifacts, client, run_id, f"models/station_{station_number}",
+            lambda path: save_onnx_model(onnx_model=onnx_model, path=path, signature=signature)
+        )
+        scaler_future = executor.submit(
+            upload_model_artifacts, client, run_id, f"scalers/station_{station_number}",
+            lambda path: save_sklearn_model(sk_model=scaler, path=path, metadata=scaler_meta)
+        )
+        sources = {model_name: model_future.result(), scaler_name: scaler_future.result()}
 
-    model = train_model(x_train=X_train, y_train=y_train, x_test=X_test, y_test=y_test, build_model_fn=build_model,
-                        epochs=epochs, batch_size=batch_size,
-                        verbose=1)
+    for name, source in sources.items():
+        mv = mlflow.register_model(model_uri=source, name=name)
+        client.transition_model_version_stage(name, mv.version, "staging")
 
-    mlflow.log_param("epochs", epochs)
-    mlflow.log_param("batch_size", batch_size)
-    mlflow.log_param("train_dataset_size", len(train_data))
 
-    model.output_names = ["output"]
+def train_model_pipeline(station_number: int) -> None:
+    client = get_mlflow_client()
 
-    input_signature = [
-        tf.TensorSpec(shape=(None, settings.window_size, settings.top_features + 1), dtype=tf.double, name="input")
-    ]
+    with mlflow.start_run(run_name=f"mbajk_station_{station_number}", experiment_id="1") as run:
+        scaler = MinMaxScaler()
 
-    onnx_model, _ = tf2onnx.convert.from_keras(model=model, input_signature=input_signature, opset=13)
+        train_data, test_data = get_test_train_data(str(station_number))
 
-    model_ = log_onnx_model(onnx_model=onnx_model,
-                            artifact_path=f"models/station_{station_number}",
-                            signature=infer_signature(X_test, model.predict(X_test)),
-                            registered_model_name="mbajk_station_" + str(station_number))
+        X_train, y_train, X_test, y_test = prepare_model_data(scaler=scaler, train_data=train_data,
+                                                              test_data=test_data)
 
-    mv = client.create_model_version(name="mbajk_station_" + str(station_number), source=model_.model_uri,
-                                     run_id=model_.run_id)
-    client.transition_model_version_stage("mbajk_station_" + str(station_number), mv.version, "staging")
+        epochs = 10
+        batch_size = 64
 
-    # save scaler
-    scaler_meta = {"feature_range": scaler.feature_range}
-    scaler = log_sklearn_model(
-        sk_model=scaler,
-        artifact_path=f"scalers/station_{station_number}",
-        registered_model_name="mbajk_station_" + str(station_number) + "_scaler",
-        metadata=scaler_meta
-    )
+        model = train_model(x_train=X_train, y_train=y_train, x_test=X_test, y_test=y_test,
+                            build_model_fn=build_model, epochs=epochs, batch_size=batch_size, verbose=1)
+
+        client.log_batch(run.info.run_id, params=[
+            Param("epochs", str(epochs)),
+            Param("batch_size", str(batch_size)),
+            Param("train_dataset_size", str(len(train_data))),
+        ])
+
+        model.output_names = ["output"]
+
+        input_signature = [
+            tf.TensorSpec(shape=(None, settings.window_size, settings.top_features + 1), dtype=tf.double,
+                          name="input")
+        ]
+
+        onnx_model, _ = tf2onnx.convert.from_keras(model=model, input_signature=input_signature, opset=13)
+
+        # the signature only needs the input/output schema, so a single sample is enough; calling the model
+        # directly skips the batching and progress bar machinery of model.predict
+        signature = infer_signature(X_test[:1], model(X_test[:1], training=False).numpy())
+
+        save_artifacts_parallel(client, run.info.run_id, station_number, onnx_model, scaler, signature=signature)
 
-    sv = client.create_model_version(name="mbajk_station_" + str(station_number) + "_scaler", source=scaler.model_uri,
-                                     run_id=scaler.run_id)
-    # set stage
-    client.transition_model_version_stage("mbajk_station_" + str(station_number) + "_scaler", sv.version, "staging")
+        logger.info(f"[Train Model] - Model for station {station_number} has been trained and saved")
 
-    print(f"[Train Model] - Model for station {station_number} has been trained and saved")
 
-    mlflow.end_run()
+def init_worker(log_queue: mp.Queue, threads_per_worker: int) -> None:
+    configure_worker_logging(log_queue)
+    tf.config.threading.set_intra_op_parallelism_threads(threads_per_worker)
+    tf.config.threading.set_inter_op_parallelism_threads(threads_per_worker)
+    init_mlflow_tracking()
 
 
 @execution_timer("Train Model")
 def main() -> None:
-    dir_path = "data/processed"
-    station_numbers = [int(folder) for folder in os.listdir(dir_path) if os.path.isdir(os.path.join(dir_path, folder))]
+    station_numbers = get_station_numbers("data/processed")
+    if not station_numbers:
+        return
 
-    dagshub.auth.add_app_token(token=settings.dagshub_user_token)
-    dagshub.init("mbajk-ml-web-service", "perkzen", mlflow=True)
-    mlflow.set_tracking_uri(settings.mlflow_tracking_uri)
+    # stations are independent, so each one is trained in its own process; spawn keeps TensorFlow state
+    # from being forked into the workers
+    mp_context = mp.get_context("spawn")
+    log_queue = mp_context.Queue()
 
-    for station_number in station_numbers:
-        train_model_pipeline(station_number)
+    max_workers, threads_per_worker = get_worker_counts(len(station_numbers))
+    with queue_logging(log_queue), ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                                                       initializer=init_worker,
+                                                       initargs=(log_queue, threads_per_worker)) as executor:
+        list(executor.map(train_model_pipeline, station_numbers))
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -1,8 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 # Order of the fields is important for inverse transformation
 class PredictBikesDTO(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid", strict=True)
+
     available_bike_stands: int
     surface_pressure: float
     temperature: float
@@ -1,10 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import RedirectResponse
 from .routers import health_router, bike_stations_router, prediction_router
-from ..models.model_registry import download_model_registry
+from .services import get_ml_service
+from ..models.helpers import init_mlflow_tracking
+from ..models.model_registry import download_production_model
+from ..utils.logger import setup_logging
 
-app = FastAPI()
+setup_logging()
+
+
+def warm_up_station(station_number: int) -> None:
+    if download_production_model(station_number):
+        get_ml_service(station_number)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # stations are downloaded and loaded in parallel threads, so the first requests don't pay for it
+    await asyncio.to_thread(init_mlflow_tracking)
+    await asyncio.gather(*[asyncio.to_thread(warm_up_station, station_number) for station_number in range(1, 30)])
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["*"]
 
@@ -21,11 +42,6 @@ app.include_router(bike_stations_router)
 app.include_router(prediction_router)
 
 
-@app.on_event("startup")
-async def startup_event():
-    download_model_registry()
-
-
 @app.get("/")
 def root():
     return RedirectResponse(url="/docs")
@@ -1,7 +1,8 @@
+import asyncio
 from typing import List
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, BackgroundTasks, Path
 from src.serve.dto import PredictionDTO
-from src.serve.services import MLService, BikeStationsService
+from src.serve.services import BikeStationsService, PredictionBatcher, get_ml_service
 from src.serve.services.prediction_service import PredictionService
 from cachetools import TTLCache
 
@@ -12,30 +13,27 @@ router = APIRouter(
 
 bike_service = BikeStationsService()
 
+prediction_batcher = PredictionBatcher()
+
 # Create a cache with a TTL (time-to-live) of 30 minutes (1800 seconds)
 cache = TTLCache(maxsize=1000, ttl=1800)
 
 
 @router.get("/predict/{station_number}/{n_future}")
-def predict_multiple(station_number: int, n_future: int, background_tasks: BackgroundTasks) -> List[PredictionDTO]:
-    if n_future < 1:
-        raise HTTPException(status_code=400, detail="n_future must be greater than 0")
-
-    if n_future > 7:
-        raise HTTPException(status_code=400, detail="n_future must be less than 8")
-
-    if station_number < 0 or station_number > 29:
-        raise HTTPException(status_code=400, detail="station_number must be between 0 and 29")
-
+async def predict_multiple(background_tasks: BackgroundTasks, station_number: int = Path(..., ge=0, le=29),
+                           n_future: int = Path(..., ge=1, le=7)) -> List[PredictionDTO]:
     cache_key = (station_number, n_future)
     if cache_key in cache:
         return cache[cache_key]
 
-    data = bike_service.get_bike_station_history_data(station_number)
-
-    ml_service = MLService(f"{station_number}/model", f"{station_number}/minmax")
+    # blocking I/O and inference run in worker threads so the event loop keeps serving other requests
+    data, ml_service = await asyncio.gather(
+        asyncio.to_thread(bike_service.get_bike_station_history_data, station_number),
+        asyncio.to_thread(get_ml_service, station_number)
+    )
 
-    predictions = ml_service.predict_multiple(data, n_future)
+    # concurrent requests for the same station share one batched inference
+    predictions = await prediction_batcher.predict_multiple(ml_service, data, n_future)
 
     # Queue saving predictions in the background
     background_tasks.add_task(lambda: PredictionService.save(station_number, n_future, predictions))
@@ -1,4 +1,5 @@
-from .ml_service import MLService
+from .ml_service import MLService, get_ml_service
 from .bike_stations_service import BikeStationsService
+from .prediction_batcher import PredictionBatcher
 
-__all__ = ["MLService", "BikeStationsService"]
+__all__ = ["MLService", "get_ml_service", "BikeStationsService", "PredictionBatcher"]
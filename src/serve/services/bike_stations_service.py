@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from typing import List
 from src.config import settings
@@ -20,8 +21,6 @@ class BikeStationsService:
         return BikeStationDTO.from_entity(station)
 
     @staticmethod
-    def get_bike_station_history_data(number: int):
+    def get_bike_station_history_data(number: int) -> pd.DataFrame:
         url = f"https://dagshub.com/perkzen/mbajk-ml-web-service/raw/main/data/processed/{number}/mbajk_station_{number}.csv"
-        df = pd.read_csv(url)
-        df = df.drop(columns=["date"])
-        return df.to_dict(orient="records")
+        return pd.read_csv(url, usecols=lambda column: column != "date", dtype=np.float32)
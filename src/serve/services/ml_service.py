@@ -1,74 +1,83 @@
 import joblib
+from functools import lru_cache
 import numpy as np
 import pandas as pd
-import onnxruntime as ort
-from typing import Any, List
+from typing import List
 from sklearn.preprocessing import MinMaxScaler
 from ..dto import PredictionDTO
 from ...config import settings
 from ...data.data_fetcher import DataFetcher
-from ...utils.dict import add_keys_to_dict
+from ...models.helpers import create_inference_session
 
 
 class MLService:
     def __init__(self, model_name: str, scaler_name: str):
-        self.model = ort.InferenceSession(f"models/{model_name}_production.onnx")
+        self.model = create_inference_session(f"models/{model_name}_production.onnx")
         self.scaler: MinMaxScaler = joblib.load(f"models/{scaler_name}_scaler_production.gz")
 
-    def predict(self, data: List[dict]) -> int:
-        prepared_data = self.__prepare_data(data)
+        # MinMaxScaler.transform is x * scale_ + min_, kept as arrays so the hot path skips sklearn's validation
+        self._scale = self.scaler.scale_.astype(np.float64)
+        self._min = self.scaler.min_.astype(np.float64)
+
+    def predict(self, data: pd.DataFrame) -> float:
+        window = data.to_numpy(dtype=np.float32)[np.newaxis, :settings.window_size]
+        return self.predict_batch(window)[0]
+
+    def predict_batch(self, windows: np.ndarray) -> np.ndarray:
+        # the exported ONNX graph takes float64 input, so scaling writes straight into a float64 buffer
+        prepared_data = np.multiply(windows, self._scale, dtype=np.float64)
+        np.add(prepared_data, self._min, out=prepared_data)
 
         predicted = self.model.run(["output"], {"input": prepared_data})[0]
 
-        prediction_copies = np.repeat(predicted, prepared_data.shape[2], axis=-1)
-        predicted = self.scaler.inverse_transform(
-            np.reshape(prediction_copies, (len(predicted), prepared_data.shape[2])))[:, 0]
+        # inverse of the scaling for the first column, which is the predicted one
+        return (predicted[:, 0] - self._min[0]) / self._scale[0]
 
-        return predicted[0]
+    def predict_multiple(self, data: pd.DataFrame, n_future: int) -> List[PredictionDTO]:
+        return self.predict_multiple_batched([data], [n_future])[0]
 
-    def predict_multiple(self, data: List[dict], n_future: int) -> List[PredictionDTO]:
+    def predict_multiple_batched(self, batch: List[pd.DataFrame], n_futures: List[int]) -> List[List[PredictionDTO]]:
         data_fetcher = DataFetcher(lat=settings.lat, lon=settings.lon)
-        res = data_fetcher.get_weather_forecast_for_next_n_hours(hours=n_future)
+        res = data_fetcher.get_weather_forecast_for_next_n_hours(hours=max(n_futures))
 
-        required_keys = list(data[0].keys())
-        required_keys.remove("available_bike_stands")
+        # the buffers are uninitialised, so every first window has to be filled from the history itself
+        if any(len(data) < settings.window_size for data in batch):
+            raise ValueError(f"History must contain at least {settings.window_size} rows")
 
-        predictions: List[PredictionDTO] = []
+        columns = list(batch[0].columns)
+        target_col_idx = columns.index("available_bike_stands")
 
-        for n in range(n_future):
-            prediction = max(0, int(self.predict(data)))
+        # each history is copied once into a contiguous float32 buffer with room for the predicted rows,
+        # the window for step n is then a slice of it
+        history_sizes = [len(data) for data in batch]
+        buffers = [np.empty((size + n_future, len(columns)), dtype=np.float32)
+                   for size, n_future in zip(history_sizes, n_futures)]
+        for buffer, data, size in zip(buffers, batch, history_sizes):
+            buffer[:size] = data.to_numpy(dtype=np.float32)
 
-            predictions.append(PredictionDTO(prediction=prediction, date=f"{res[n].date}:00"))
+        predictions: List[List[PredictionDTO]] = [[] for _ in batch]
 
-            new_data = add_keys_to_dict(res[n].model_dump(), required_keys)
-            new_data["available_bike_stands"] = prediction
+        for n in range(max(n_futures)):
+            active = [i for i, n_future in enumerate(n_futures) if n < n_future]
+            windows = np.stack([buffers[i][n:n + settings.window_size] for i in active])
 
-            data.append(new_data)
-            data.pop(0)
+            predicted = self.predict_batch(windows)
 
-        return predictions
+            weather = res[n].model_dump()
+            new_row = np.array([weather[column] if column != "available_bike_stands" else 0 for column in columns],
+                               dtype=np.float32)
 
-    def __prepare_data(self, data: List[dict]) -> np.ndarray[Any, np.dtype]:
-        data = [item for item in data]
-        data_values = []
-        for item in data:
-            values = list(item.values())
-            data_values.append(values)
+            for i, value in zip(active, predicted):
+                prediction = max(0, int(value))
 
-        data_keys = list(data[0].keys())
-        data = pd.DataFrame(data_values, columns=data_keys)
+                predictions[i].append(PredictionDTO(prediction=prediction, date=f"{res[n].date}:00"))
 
-        scaled_data = self.scaler.transform(data)
+                new_row[target_col_idx] = prediction
+                buffers[i][history_sizes[i] + n] = new_row
 
-        return self.__create_time_series(scaled_data, settings.window_size, list(range(0, len(data_values[0]))))
-
-    @staticmethod
-    def __create_time_series(data, window_size, feature_cols) -> np.ndarray[Any, np.dtype]:
-        sequences = []
-        n_samples = len(data)
+        return predictions
 
-        for i in range(window_size, n_samples + 1):
-            sequence = data[i - window_size:i, feature_cols]
-            sequences.append(sequence)
 
-        return np.array(sequences)
+@lru_cache(maxsize=32)
+def get_ml_service(station_number: int) -> MLService:
+    return MLService(f"{station_number}/model", f"{station_number}/minmax")
@@ -0,0 +1,59 @@
+import asyncio
+import pandas as pd
+from typing import List, Tuple
+from .ml_service import MLService
+from ..dto import PredictionDTO
+
+PendingPrediction = Tuple[pd.DataFrame, int, asyncio.Future]
+
+
+class PredictionBatcher:
+    def __init__(self, max_batch_size: int = 16, max_delay: float = 0.01):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._pending: dict[MLService, List[PendingPrediction]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def predict_multiple(self, ml_service: MLService, data: pd.DataFrame, n_future: int) -> List[PredictionDTO]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending.get(ml_service)
+        if pending is None:
+            pending = self._pending[ml_service] = []
+            loop.call_later(self.max_delay, self.__flush, ml_service, pending)
+
+        pending.append((data, n_future, future))
+
+        if len(pending) >= self.max_batch_size:
+            self.__flush(ml_service, pending)
+
+        return await future
+
+    def __flush(self, ml_service: MLService, pending: List[PendingPrediction]) -> None:
+        # the timer still fires for batches that were already flushed because they filled up
+        if self._pending.get(ml_service) is not pending:
+            return
+
+        del self._pending[ml_service]
+
+        task = asyncio.create_task(self.__run(ml_service, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def __run(ml_service: MLService, pending: List[PendingPrediction]) -> None:
+        batch = [data for data, _, _ in pending]
+        n_futures = [n_future for _, n_future, _ in pending]
+
+        try:
+            results = await asyncio.to_thread(ml_service.predict_multiple_batched, batch, n_futures)
+        except Exception as e:
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
@@ -1,10 +1,13 @@
 import json
+import logging
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime, timezone
 from src.serve.database import create_database_engine
 from src.serve.dto import PredictionDTO
 from src.serve.models.prediction import Prediction
 
+logger = logging.getLogger(__name__)
+
 
 class PredictionService:
 
@@ -29,7 +32,7 @@ class PredictionService:
             session.commit()
             return True
         except Exception as e:
-            print(f"Error saving prediction: {e}")
+            logger.error(f"Error saving prediction: {e}")
             session.rollback()
             return False
         finally:
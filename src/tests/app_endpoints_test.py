@@ -1,4 +1,5 @@
 from fastapi.testclient import TestClient
+from src.models.helpers import init_mlflow_tracking
 from src.models.model_registry import ModelType, download_model
 from src.serve.main import app
 
@@ -39,19 +40,22 @@ def test_get_bike_station_by_number():
 
 def test_fail_predict_multiple():
     response = client.get("/mbajk/predict/1/0")
-    assert response.status_code == 400
+    assert response.status_code == 422
     assert "detail" in response.json()
-    assert response.json()["detail"] == "n_future must be greater than 0"
+    assert response.json()["detail"][0]["loc"] == ["path", "n_future"]
+    assert response.json()["detail"][0]["type"] == "greater_than_equal"
 
 
 def test_fail_predict_multiple_2():
     response = client.get("/mbajk/predict/30/1")
-    assert response.status_code == 400
+    assert response.status_code == 422
     assert "detail" in response.json()
-    assert response.json()["detail"] == "station_number must be between 0 and 29"
+    assert response.json()["detail"][0]["loc"] == ["path", "station_number"]
+    assert response.json()["detail"][0]["type"] == "less_than_equal"
 
 
 def test_predict_multiple():
+    init_mlflow_tracking()
     download_model(1, ModelType.PRODUCTION)
     response = client.get("/mbajk/predict/1/3")
     assert response.status_code == 200
@@ -0,0 +1,119 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+import src.serve.services.ml_service as ml_service_module
+from src.config import settings
+from src.data.entities import Weather
+from src.serve.services import MLService, PredictionBatcher
+
+columns = ["available_bike_stands", "surface_pressure", "temperature", "apparent_temperature", "relative_humidity"]
+
+
+class StubMLService:
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = []
+
+    def predict_multiple_batched(self, batch, n_futures):
+        self.calls.append((batch, n_futures))
+        if self.error is not None:
+            raise self.error
+        return [[data] * n_future for data, n_future in zip(batch, n_futures)]
+
+
+class StubModel:
+    def run(self, output_names, input_feed):
+        x = input_feed["input"]
+        return [0.7 * x[:, -1, :1] + 0.3 * x.mean(axis=(1, 2))[:, np.newaxis]]
+
+
+class StubDataFetcher:
+    def __init__(self, lat: float, lon: float):
+        pass
+
+    @staticmethod
+    def get_weather_forecast_for_next_n_hours(hours: int = 1):
+        return [
+            Weather(temperature=10 + n, relative_humidity=60 - n, dew_point=5, apparent_temperature=9 + n,
+                    precipitation=0, rain=0, surface_pressure=980 + n, date=f"2024-05-01T{n:02d}:00")
+            for n in range(hours)
+        ]
+
+
+def create_history(seed: int, size: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "available_bike_stands": rng.integers(0, 30, size),
+        "surface_pressure": rng.uniform(970, 990, size),
+        "temperature": rng.uniform(0, 25, size),
+        "apparent_temperature": rng.uniform(-2, 25, size),
+        "relative_humidity": rng.uniform(30, 100, size),
+    }, columns=columns).astype(np.float32)
+
+
+def create_ml_service(monkeypatch: pytest.MonkeyPatch) -> MLService:
+    scaler = MinMaxScaler().fit(create_history(seed=0, size=200))
+
+    monkeypatch.setattr(ml_service_module, "create_inference_session", lambda model_path: StubModel())
+    monkeypatch.setattr(ml_service_module.joblib, "load", lambda scaler_path: scaler)
+
+    return MLService("1/model", "1/minmax")
+
+
+def test_concurrent_predictions_are_batched():
+    ml_service = StubMLService()
+    batcher = PredictionBatcher()
+
+    async def run():
+        return await asyncio.gather(*[batcher.predict_multiple(ml_service, i, i + 1) for i in range(5)])
+
+    results = asyncio.run(run())
+
+    assert len(ml_service.calls) == 1
+    assert ml_service.calls[0] == ([0, 1, 2, 3, 4], [1, 2, 3, 4, 5])
+    assert results == [[i] * (i + 1) for i in range(5)]
+
+
+def test_full_batch_is_flushed_before_timeout():
+    ml_service = StubMLService()
+    batcher = PredictionBatcher(max_batch_size=2, max_delay=60)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*[batcher.predict_multiple(ml_service, i, 1) for i in range(4)]), timeout=5
+        )
+
+    results = asyncio.run(run())
+
+    assert [n_futures for _, n_futures in ml_service.calls] == [[1, 1], [1, 1]]
+    assert results == [[0], [1], [2], [3]]
+
+
+def test_error_is_raised_for_every_request():
+    ml_service = StubMLService(error=RuntimeError("inference failed"))
+    batcher = PredictionBatcher()
+
+    async def run():
+        return await asyncio.gather(*[batcher.predict_multiple(ml_service, i, 1) for i in range(3)],
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert len(ml_service.calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_batched_predictions_match_single_predictions(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ml_service_module, "DataFetcher", StubDataFetcher)
+    ml_service = create_ml_service(monkeypatch)
+
+    histories = [create_history(seed=i, size=settings.window_size + 10 + i) for i in range(1, 4)]
+    n_futures = [3, 7, 1]
+
+    batched = ml_service.predict_multiple_batched(histories, n_futures)
+    single = [ml_service.predict_multiple(history, n_future) for history, n_future in zip(histories, n_futures)]
+
+    assert [len(predictions) for predictions in batched] == n_futures
+    assert batched == single
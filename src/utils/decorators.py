@@ -1,7 +1,10 @@
+import logging
 from time import perf_counter
 from functools import wraps
 from typing import Callable, Any
 
+logger = logging.getLogger(__name__)
+
 
 def execution_timer(name: str = None) -> Callable:
     def decorator(func: Callable) -> Callable:
@@ -15,7 +18,7 @@ def execution_timer(name: str = None) -> Callable:
 
             execution_time: int = int((end_time - start_time) * 1000)
 
-            print(f'[{log_name}] - took {execution_time}ms to execute')
+            logger.info(f'[{log_name}] - took {execution_time}ms to execute')
             return result
 
         return wrapper
@@ -0,0 +1,32 @@
+import logging
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import Queue
+from typing import Iterator
+
+
+def setup_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+
+def configure_worker_logging(queue: Queue) -> None:
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(queue)]
+    root.setLevel(logging.INFO)
+
+
+@contextmanager
+def queue_logging(queue: Queue) -> Iterator[None]:
+    # records from every process go through the queue and are written by a single listener thread
+    root = logging.getLogger()
+    handlers = root.handlers
+
+    listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    root.handlers = [QueueHandler(queue)]
+    listener.start()
+
+    try:
+        yield
+    finally:
+        listener.stop()
+        root.handlers = handlers